@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import deque
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker(object):
+    """
+    Tracks consecutive failures for a single endpoint. Once `failure_threshold`
+    failures have been seen the circuit opens and calls fail fast until
+    `recovery_timeout` seconds have passed, after which a single probe request
+    is let through to decide whether to close the circuit again.
+    """
+
+    def __init__(self, failure_threshold=5, recovery_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+
+        self._lock = threading.Lock()
+
+    def allow_request(self):
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+
+            now = time.time()
+
+            # Let a single probe through, everything else keeps failing fast
+            # until it reports back. A probe that never reports back (e.g. the
+            # thread was killed) is replaced once `recovery_timeout` has passed.
+            if (
+                (self.state == STATE_OPEN and now - self.opened_at >= self.recovery_timeout) or
+                (self.state == STATE_HALF_OPEN and now - self.probe_started_at >= self.recovery_timeout)
+            ):
+                self.state = STATE_HALF_OPEN
+                self.probe_started_at = now
+                return True
+
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self.opened_at = None
+
+    # The probe ended without telling us anything about the endpoint (e.g. a
+    # bug in the caller), so let the next request probe instead.
+    def release_probe(self):
+        with self._lock:
+            if self.state == STATE_HALF_OPEN:
+                self.state = STATE_OPEN
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = STATE_OPEN
+                self.opened_at = time.time()
+
+
+class LatencyTracker(object):
+    """
+    Keeps a rolling window of response times for a single endpoint, used to
+    decide when a hedged request should be sent, along with which of the
+    recent requests were hedged so the extra load can be capped.
+    """
+
+    def __init__(self, window=100, min_samples=20):
+        self.min_samples = min_samples
+
+        self._samples = deque(maxlen=window)
+        self._hedges = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def record_hedge(self, hedged):
+        with self._lock:
+            self._hedges.append(hedged)
+
+    def hedge_ratio(self):
+        with self._lock:
+            if not self._hedges:
+                return 0.0
+
+            return sum(self._hedges) / float(len(self._hedges))
+
+    def percentile(self, percent):
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+
+            samples = sorted(self._samples)
+
+        index = int(round(percent / 100.0 * (len(samples) - 1)))
+        return samples[index]
@@ -1,7 +1,17 @@
 import json
+import threading
+import time
 
 import requests
+from rlapi.breaker import CircuitBreaker, CircuitOpenError, LatencyTracker
+from rlapi.compression import ACCEPT_ENCODING, Decoder
 from rlapi.constants import *
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
 
 
 class RocketLeagueAPI(object):
@@ -34,6 +44,28 @@ class RocketLeagueAPI(object):
         self.DEBUG_REQUEST = kwargs.get('debug_request', False)
         self.DEBUG_RESPONSE = kwargs.get('debug_response', False)
 
+        # Without a timeout `requests` will wait forever on a degraded API.
+        self.TIMEOUT = (
+            kwargs.get('connect_timeout', DEFAULT_CONNECT_TIMEOUT),
+            kwargs.get('read_timeout', DEFAULT_READ_TIMEOUT),
+        )
+
+        self.FAILURE_THRESHOLD = kwargs.get('failure_threshold', DEFAULT_FAILURE_THRESHOLD)
+        self.RECOVERY_TIMEOUT = kwargs.get('recovery_timeout', DEFAULT_RECOVERY_TIMEOUT)
+
+        self.HEDGE_REQUESTS = kwargs.get('hedge_requests', False)
+        self.HEDGE_PERCENTILE = kwargs.get('hedge_percentile', DEFAULT_HEDGE_PERCENTILE)
+        self.HEDGE_RATIO = kwargs.get('hedge_ratio', DEFAULT_HEDGE_RATIO)
+
+        # Circuit breakers and latency trackers are kept per (method, endpoint template).
+        self.circuit_breakers = {}
+        self.latency_trackers = {}
+        self._lock = threading.Lock()
+
+        # Bytes sent and received, both per (method, endpoint template) and in total.
+        self.transfer_stats = {}
+        self.transfer_totals = self.empty_transfer_stats()
+
     def debug_request(self, response):
         req = response.request
 
@@ -80,7 +112,152 @@ class RocketLeagueAPI(object):
         if allow_multiple:
             return request_method, player_id
 
-    def request(self, endpoint, request_method='GET', data=None):
+    def circuit_breaker(self, key):
+        with self._lock:
+            if key not in self.circuit_breakers:
+                self.circuit_breakers[key] = CircuitBreaker(
+                    failure_threshold=self.FAILURE_THRESHOLD,
+                    recovery_timeout=self.RECOVERY_TIMEOUT,
+                )
+
+            return self.circuit_breakers[key]
+
+    def latency_tracker(self, key):
+        with self._lock:
+            if key not in self.latency_trackers:
+                self.latency_trackers[key] = LatencyTracker()
+
+            return self.latency_trackers[key]
+
+    def empty_transfer_stats(self):
+        return {
+            'requests': 0,
+            'sent_bytes': 0,
+            'compressed_bytes': 0,
+            'decompressed_bytes': 0,
+        }
+
+    def record_transfer(self, key, request):
+        with self._lock:
+            if key not in self.transfer_stats:
+                self.transfer_stats[key] = self.empty_transfer_stats()
+
+            for stats in (self.transfer_stats[key], self.transfer_totals):
+                stats['requests'] += 1
+                stats['sent_bytes'] += request.sent_bytes
+                stats['compressed_bytes'] += request.compressed_bytes
+                stats['decompressed_bytes'] += request.decompressed_bytes
+
+    # Read the body ourselves rather than letting `requests` do it, so the
+    # compressed bytes can be counted as they come off the wire (`raw.tell()`
+    # isn't updated for chunked responses) and decompressed as they arrive.
+    def read_body(self, request):
+        chunks = []
+
+        request.compressed_bytes = 0
+
+        try:
+            decoder = Decoder(request.headers.get('Content-Encoding'))
+
+            for chunk in request.raw.stream(CHUNK_SIZE, decode_content=False):
+                request.compressed_bytes += len(chunk)
+                chunks.append(decoder.decompress(chunk))
+
+            chunks.append(decoder.flush())
+        except ReadTimeoutError as e:
+            raise requests.exceptions.ReadTimeout(e, request=request)
+        except ProtocolError as e:
+            raise requests.exceptions.ConnectionError(e, request=request)
+        finally:
+            request.close()
+
+        # Hand the body back to the Response, so `.json()` and `.text` work.
+        request._content = b''.join(chunks)
+        request._content_consumed = True
+
+        request.decompressed_bytes = len(request._content)
+
+    def send(self, key, request_method, request_url, data):
+        start = time.time()
+
+        try:
+            request = getattr(requests, request_method.lower())(request_url, headers={
+                'Authorization': 'Token ' + self.TOKEN,
+                'User-Agent': 'python-rocket-league ' + '.'.join(str(ver) for ver in VERSION),
+                'Accept-Encoding': ACCEPT_ENCODING,
+            }, data=data, timeout=self.TIMEOUT, stream=True)
+
+            self.read_body(request)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            # Slow failures have to count towards the percentile too, otherwise
+            # the hedging threshold stays at its healthy value during an outage.
+            self.latency_tracker(key).record(time.time() - start)
+            raise
+
+        self.latency_tracker(key).record(time.time() - start)
+
+        # Only the request body is counted, not the request line or headers.
+        request.sent_bytes = len(data.encode('utf-8')) if data else 0
+
+        # Every response is counted, including the losing side of a hedged
+        # request, as those bytes were still transferred.
+        self.record_transfer(key, request)
+        return request
+
+    # Send the request, and if no response has arrived once the percentile
+    # latency for this endpoint has passed, send a duplicate and use whichever
+    # comes back first.  Only safe for idempotent requests.
+    def send_hedged(self, key, request_method, request_url, data):
+        tracker = self.latency_tracker(key)
+        delay = tracker.percentile(self.HEDGE_PERCENTILE)
+
+        # Not enough samples to know what a slow response looks like yet.
+        if delay is None:
+            return self.send(key, request_method, request_url, data)
+
+        results = queue.Queue()
+
+        def worker():
+            try:
+                results.put((self.send(key, request_method, request_url, data), None))
+            except Exception as e:
+                results.put((None, e))
+
+        def start_worker():
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+
+        start_worker()
+        pending = 1
+
+        try:
+            request, error = results.get(timeout=delay)
+            tracker.record_hedge(False)
+        except queue.Empty:
+            # Don't add load to an endpoint that is already failing, and cap
+            # how many requests are duplicated.
+            if self.circuit_breaker(key).failures or tracker.hedge_ratio() >= self.HEDGE_RATIO:
+                tracker.record_hedge(False)
+            else:
+                tracker.record_hedge(True)
+                start_worker()
+                pending += 1
+
+            request, error = results.get()
+
+        pending -= 1
+
+        # The first attempt failed, give the other one a chance to succeed.
+        if error is not None and pending:
+            request, error = results.get()
+
+        if error is not None:
+            raise error
+
+        return request
+
+    def request(self, endpoint, request_method='GET', data=None, template=None):
         request_url = API_BASE_URL + endpoint + '/'
 
         if self.DEBUG_REQUEST:
@@ -89,10 +266,32 @@ class RocketLeagueAPI(object):
         if request_method == 'POST':
             data = json.dumps(data)
 
-        request = getattr(requests, request_method.lower())(request_url, headers={
-            'Authorization': 'Token ' + self.TOKEN,
-            'User-Agent': 'python-rocket-league ' + '.'.join(str(ver) for ver in VERSION),
-        }, data=data)
+        key = (request_method, template or endpoint)
+        breaker = self.circuit_breaker(key)
+
+        if not breaker.allow_request():
+            raise CircuitOpenError('The circuit for {} {} is open.'.format(*key))
+
+        try:
+            if self.HEDGE_REQUESTS and request_method == 'GET':
+                request = self.send_hedged(key, request_method, request_url, data)
+            else:
+                request = self.send(key, request_method, request_url, data)
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            breaker.record_failure()
+            raise
+        except BaseException:
+            # Includes KeyboardInterrupt, SystemExit and the like, which would
+            # otherwise leave the circuit half-open.
+            breaker.release_probe()
+            raise
+
+        # Gateway errors mean the API itself is struggling.  Other 5xx responses
+        # are returned for specific bad inputs, so don't trip the circuit on them.
+        if request.status_code in (502, 503, 504):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
 
         # Allow developers to look into the Response object.
         if self.DEBUG_RESPONSE:
@@ -116,10 +315,12 @@ class RocketLeagueAPI(object):
         self.verify_platform(platform)
         self.verify_playlist(playlist)
 
-        return self.request('{platform}/leaderboard/skills/{playlist}'.format(
+        endpoint = '{platform}/leaderboard/skills/{playlist}'
+
+        return self.request(endpoint.format(
             platform=platform,
             playlist=playlist,
-        ))
+        ), template=endpoint)
 
     # GET /api/v1/<platform>/leaderboard/stats/
     # GET /api/v1/<platform>/leaderboard/stats/<stat_type>/
@@ -127,10 +328,12 @@ class RocketLeagueAPI(object):
         self.verify_platform(platform)
         self.verify_stat_type(stat_type)
 
-        return self.request('{platform}/leaderboard/stats{stat_type}'.format(
+        endpoint = '{platform}/leaderboard/stats{stat_type}'
+
+        return self.request(endpoint.format(
             platform=platform,
             stat_type='/' + stat_type if stat_type else '',
-        ))
+        ), template=endpoint)
 
     # GET  /api/v1/<platform>/playerskills/<player_id>/
     # POST /api/v1/<platform>/playerskills/
@@ -144,20 +347,24 @@ class RocketLeagueAPI(object):
                 'player_ids': player_id,
             }
 
-        return self.request('{platform}/playerskills{player_id}'.format(
+        endpoint = '{platform}/playerskills{player_id}'
+
+        return self.request(endpoint.format(
             platform=platform,
             player_id='/' + str(player_id) if request_method == 'GET' else '',
-        ), request_method, data)
+        ), request_method, data, template=endpoint)
 
     # GET /api/v1/<platform>/playertitles/<player_id>/
     def get_player_titles(self, platform, player_id):
         self.verify_platform(platform)
         self.verify_player_id(player_id, allow_multiple=False)
 
-        return self.request('{platform}/playertitles/{player_id}'.format(
+        endpoint = '{platform}/playertitles/{player_id}'
+
+        return self.request(endpoint.format(
             platform=platform,
             player_id=player_id,
-        ))
+        ), template=endpoint)
 
     # GET  /api/v1/<platform>/leaderboard/stats/<stat_type>/<player_id>/
     # POST /api/v1/<platform>/leaderboard/stats/<stat_type>/
@@ -172,11 +379,13 @@ class RocketLeagueAPI(object):
                 'player_ids': player_id,
             }
 
-        return self.request('{platform}/leaderboard/stats/{stat_type}{player_id}'.format(
+        endpoint = '{platform}/leaderboard/stats/{stat_type}{player_id}'
+
+        return self.request(endpoint.format(
             platform=platform,
             stat_type=stat_type,
             player_id='/' + str(player_id) if request_method == 'GET' else '',
-        ), request_method, data)
+        ), request_method, data, template=endpoint)
 
     # Custom method, smooths over the fact that `get_stats_value_for_user` only
     # returns one stat at a time.
@@ -0,0 +1,115 @@
+import zlib
+
+from requests.exceptions import ContentDecodingError
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Only ask for encodings we're able to decode.
+ACCEPT_ENCODING = 'gzip, deflate, br' if brotli else 'gzip, deflate'
+
+DECODE_ERRORS = (zlib.error, brotli.error) if brotli else (zlib.error,)
+
+
+class GzipDecoder(object):
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+    def decompress(self, chunk):
+        return self._decompressor.decompress(chunk)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class DeflateDecoder(object):
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj()
+        self._first_chunk = True
+
+    def decompress(self, chunk):
+        # Some servers send raw deflate data without the zlib header.
+        if self._first_chunk and chunk:
+            self._first_chunk = False
+
+            try:
+                return self._decompressor.decompress(chunk)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+
+        return self._decompressor.decompress(chunk)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class BrotliDecoder(object):
+
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+
+    def decompress(self, chunk):
+        return self._decompressor.process(chunk)
+
+    def flush(self):
+        return b''
+
+
+DECODERS = {
+    'gzip': GzipDecoder,
+    'x-gzip': GzipDecoder,
+    'deflate': DeflateDecoder,
+}
+
+if brotli:
+    DECODERS['br'] = BrotliDecoder
+
+
+class Decoder(object):
+    """
+    Incrementally decompresses a response body as it comes off the wire,
+    based on its `Content-Encoding` header. Stacked encodings such as
+    `gzip, br` are undone in the reverse of the order they were applied.
+    """
+
+    def __init__(self, content_encoding):
+        self._decoders = []
+
+        for encoding in reversed((content_encoding or '').split(',')):
+            encoding = encoding.strip().lower()
+
+            if encoding in ('', 'identity'):
+                continue
+
+            if encoding not in DECODERS:
+                raise ContentDecodingError('Unsupported Content-Encoding: {}.'.format(content_encoding))
+
+            self._decoders.append(DECODERS[encoding]())
+
+    def decompress(self, chunk):
+        try:
+            for decoder in self._decoders:
+                chunk = decoder.decompress(chunk)
+        except DECODE_ERRORS as e:
+            raise ContentDecodingError(e)
+
+        return chunk
+
+    def flush(self):
+        data = b''
+
+        try:
+            # Whatever one decoder flushes still has to pass through the rest.
+            for decoder in self._decoders:
+                if data:
+                    data = decoder.decompress(data)
+
+                data += decoder.flush()
+        except DECODE_ERRORS as e:
+            raise ContentDecodingError(e)
+
+        return data
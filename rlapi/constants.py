@@ -24,3 +24,15 @@ STAT_MVPS = 'mvps'
 STAT_SAVES = 'saves'
 STAT_SHOTS = 'shots'
 STAT_WINS = 'wins'
+
+# Request handling
+DEFAULT_CONNECT_TIMEOUT = 5
+DEFAULT_READ_TIMEOUT = 30
+DEFAULT_FAILURE_THRESHOLD = 5
+DEFAULT_RECOVERY_TIMEOUT = 30
+DEFAULT_HEDGE_PERCENTILE = 95
+DEFAULT_HEDGE_RATIO = 0.1
+CHUNK_SIZE = 64 * 1024
+
+# Exporting
+DEFAULT_ROW_GROUP_SIZE = 100000
@@ -0,0 +1,225 @@
+# Stream crawled data into compressed, columnar Parquet files.
+#
+# Requires `pyarrow`, install it with `pip install python-rocket-league[export]`.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+from rlapi.client import RocketLeagueAPI
+from rlapi.constants import *
+
+
+def require_pyarrow():
+    if pa is None:
+        raise ImportError(
+            'Exporting requires pyarrow, install it with `pip install python-rocket-league[export]`.'
+        )
+
+
+def skill_schema():
+    # Steam IDs may be passed as either integers or strings, so they're
+    # stored as strings like the player IDs in `stats_schema`.
+    return pa.schema([
+        ('platform', pa.string()),
+        ('user_id', pa.string()),
+        ('user_name', pa.string()),
+        ('playlist', pa.int32()),
+        ('skill', pa.int64()),
+        ('tier', pa.int32()),
+        ('tier_max', pa.int32()),
+        ('division', pa.int32()),
+        ('matches_played', pa.int64()),
+    ])
+
+
+def stats_schema():
+    # Steam players are keyed by their numerical ID, everyone else by their
+    # name, so the key is always stored as a string.
+    return pa.schema(
+        [('platform', pa.string()), ('player_id', pa.string())] +
+        [(stat_type, pa.int64()) for stat_type in RocketLeagueAPI.STAT_TYPES]
+    )
+
+
+# Coerce values as rows are built, so a bad value raises for that row rather
+# than when the whole row group is flushed.
+def to_int(value):
+    return None if value is None else int(value)
+
+
+def to_str(value):
+    return None if value is None else str(value)
+
+
+# Flatten a `get_player_skills` response into one row per player per playlist.
+# Error responses (a string or a `{"detail": ...}` dict) are skipped.
+def skill_rows(platform, response):
+    if not isinstance(response, list):
+        return
+
+    for player in response:
+        for skill in player.get('player_skills', []):
+            yield {
+                'platform': platform,
+                'user_id': to_str(player.get('user_id')),
+                'user_name': to_str(player.get('user_name')),
+                'playlist': to_int(skill['playlist']),
+                'skill': to_int(skill.get('skill')),
+                'tier': to_int(skill.get('tier')),
+                'tier_max': to_int(skill.get('tier_max')),
+                'division': to_int(skill.get('division')),
+                'matches_played': to_int(skill.get('matches_played')),
+            }
+
+
+# Flatten a `get_stats_values_for_user` response into one row per player.
+def stats_rows(platform, response):
+    if not isinstance(response, dict):
+        return
+
+    for player_id, stats in response.items():
+        if not isinstance(stats, dict):
+            continue
+
+        row = {
+            'platform': platform,
+            'player_id': str(player_id),
+        }
+
+        for stat_type in RocketLeagueAPI.STAT_TYPES:
+            row[stat_type] = to_int(stats.get(stat_type))
+
+        yield row
+
+
+class ColumnarWriter(object):
+    """
+    Buffers rows column by column and flushes them to the file one row group
+    at a time, so only `row_group_size` rows are ever held in memory.
+    """
+
+    def __init__(self, path, schema, row_group_size=DEFAULT_ROW_GROUP_SIZE, compression='zstd'):
+        require_pyarrow()
+
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self.rows_written = 0
+
+        # The (min, max) of each integer column, used to check rows before
+        # they're buffered.
+        self._int_bounds = {}
+
+        for field in schema:
+            if pa.types.is_integer(field.type):
+                bits = field.type.bit_width
+
+                if pa.types.is_signed_integer(field.type):
+                    self._int_bounds[field.name] = (-2 ** (bits - 1), 2 ** (bits - 1) - 1)
+                else:
+                    self._int_bounds[field.name] = (0, 2 ** bits - 1)
+
+        self._writer = pq.ParquetWriter(path, schema, compression=compression)
+        self._reset()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _reset(self):
+        self._columns = {name: [] for name in self.schema.names}
+        self._buffered = 0
+
+    # Raise for a row that wouldn't fit the schema, before it's buffered.
+    # Otherwise the error would only surface when the row group is flushed,
+    # taking the rest of the buffered rows with it.
+    def validate(self, row):
+        for name, (minimum, maximum) in self._int_bounds.items():
+            value = row.get(name)
+
+            if value is not None and not minimum <= value <= maximum:
+                raise ValueError('{} is out of range for {}: {}.'.format(name, self.schema.field(name).type, value))
+
+    def write(self, row):
+        self.validate(row)
+
+        for name in self.schema.names:
+            self._columns[name].append(row.get(name))
+
+        self._buffered += 1
+
+        if self._buffered >= self.row_group_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        count = 0
+
+        for row in rows:
+            self.write(row)
+            count += 1
+
+        return count
+
+    def flush(self):
+        if not self._buffered:
+            return
+
+        try:
+            table = pa.Table.from_pydict(self._columns, schema=self.schema)
+            self._writer.write_table(table)
+
+            self.rows_written += self._buffered
+        finally:
+            # Never let a bad row group block the rows that come after it.
+            self._reset()
+
+    def close(self):
+        if self._writer is None:
+            return
+
+        # Always write the footer, otherwise the file can't be read at all.
+        try:
+            self.flush()
+        finally:
+            self._writer.close()
+            self._writer = None
+
+
+class PlayerSkillsWriter(ColumnarWriter):
+
+    def __init__(self, path, **kwargs):
+        require_pyarrow()
+        super(PlayerSkillsWriter, self).__init__(path, skill_schema(), **kwargs)
+
+    def write_response(self, platform, response):
+        return self.write_rows(skill_rows(platform, response))
+
+
+class PlayerStatsWriter(ColumnarWriter):
+
+    def __init__(self, path, **kwargs):
+        require_pyarrow()
+        super(PlayerStatsWriter, self).__init__(path, stats_schema(), **kwargs)
+
+    def write_response(self, platform, response):
+        return self.write_rows(stats_rows(platform, response))
+
+
+# Memory-map the file and only decode the requested columns.
+def read_table(path, columns=None):
+    require_pyarrow()
+    return pq.read_table(path, columns=columns, memory_map=True)
+
+
+# Yield one row group at a time as a `pyarrow.Table`, for files too large to
+# load in one go.
+def iter_row_groups(path, columns=None):
+    require_pyarrow()
+
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+
+    for index in range(parquet_file.num_row_groups):
+        yield parquet_file.read_row_group(index, columns=columns)
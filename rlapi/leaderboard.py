@@ -0,0 +1,124 @@
+import threading
+from collections import OrderedDict, namedtuple
+
+EVENT_ENTERED = 'entered'
+EVENT_LEFT = 'left'
+EVENT_MOVED = 'moved'
+EVENT_CHANGED = 'changed'
+
+LeaderboardEvent = namedtuple('LeaderboardEvent', [
+    'event',
+    'player',
+    'rank',
+    'previous_rank',
+    'value',
+    'previous_value',
+    'row',
+])
+
+Entry = namedtuple('Entry', ['rank', 'value', 'row'])
+
+
+# Steam players are identified by their ID, everyone else by their name. IDs
+# may come back as either integers or strings, so they're always compared as
+# strings.
+def player_key(row):
+    for field in ('user_id', 'user_name', 'username'):
+        if row.get(field) is not None:
+            return str(row[field])
+
+    raise ValueError('Unable to identify the player in {}.'.format(row))
+
+
+class LeaderboardDiff(object):
+    """
+    Keeps the previous snapshot of each leaderboard indexed by player, and
+    compares each new snapshot against it in a single pass. Only players who
+    entered, left, moved rank or changed value produce an event.
+    """
+
+    def __init__(self):
+        self.snapshots = {}
+        self._lock = threading.Lock()
+
+    def update(self, key, rows, value_field, allow_empty=False):
+        # Error responses come back as a string or a `{"detail": ...}` dict.
+        if not isinstance(rows, list):
+            raise ValueError('Expected a list of leaderboard rows, got {!r}.'.format(rows))
+
+        # An empty leaderboard is almost always a bad poll. Keep the previous
+        # snapshot rather than reporting every player as having left.
+        if not rows and not allow_empty:
+            return []
+
+        # Snapshots are kept in rank order, so the events below come out in
+        # rank order without sorting.
+        snapshot = OrderedDict()
+
+        for rank, row in enumerate(rows, 1):
+            value = row.get(value_field, row.get('value'))
+            snapshot[player_key(row)] = Entry(rank, value, row)
+
+        with self._lock:
+            previous = self.snapshots.get(key, {})
+            self.snapshots[key] = snapshot
+
+        events = []
+
+        for player, entry in snapshot.items():
+            old = previous.get(player)
+
+            if old is None:
+                event = EVENT_ENTERED
+            elif old.rank != entry.rank:
+                event = EVENT_MOVED
+            elif old.value != entry.value:
+                event = EVENT_CHANGED
+            else:
+                continue
+
+            events.append(LeaderboardEvent(
+                event=event,
+                player=player,
+                rank=entry.rank,
+                previous_rank=old.rank if old else None,
+                value=entry.value,
+                previous_value=old.value if old else None,
+                row=entry.row,
+            ))
+
+        for player, old in previous.items():
+            if player not in snapshot:
+                events.append(LeaderboardEvent(
+                    event=EVENT_LEFT,
+                    player=player,
+                    rank=None,
+                    previous_rank=old.rank,
+                    value=None,
+                    previous_value=old.value,
+                    row=old.row,
+                ))
+
+        return events
+
+    # Takes the response from `get_skill_leaderboard`.
+    def update_skill_leaderboard(self, platform, playlist, response, allow_empty=False):
+        return self.update((platform, playlist), response, 'skill', allow_empty)
+
+    # Takes the response from `get_stats_leaderboard`. Unfiltered responses
+    # contain every stat type, each of which is tracked separately.
+    def update_stats_leaderboard(self, platform, response, stat_type=None, allow_empty=False):
+        if isinstance(response, list) and response and 'stats' in response[0]:
+            events = []
+
+            for group in response:
+                events.extend(self.update(
+                    (platform, group['stat_type']),
+                    group['stats'],
+                    group['stat_type'],
+                    allow_empty,
+                ))
+
+            return events
+
+        return self.update((platform, stat_type), response, stat_type, allow_empty)
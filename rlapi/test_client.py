@@ -1,8 +1,22 @@
+import io
+import json
 import os
+import time
+import threading
+import zlib
 
 import pytest
+import requests
+import urllib3
+from rlapi.breaker import CircuitBreaker, CircuitOpenError, LatencyTracker
+from rlapi import client
 from rlapi.client import RocketLeagueAPI
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
 API_KEY = os.getenv('ROCKETLEAGUE_API_KEY', None)
 authenticated = pytest.mark.skipif(
     not API_KEY,
@@ -11,6 +25,17 @@ authenticated = pytest.mark.skipif(
 
 rl = RocketLeagueAPI('', debug_request=True)
 
+
+# Build a `requests.Response` that streams `body`, as returned by `requests.get`.
+def build_response(url, body, headers=None):
+    raw = urllib3.HTTPResponse(
+        body=io.BytesIO(body),
+        headers=headers or {},
+        status=200,
+        preload_content=False,
+    )
+    return requests.adapters.HTTPAdapter().build_response(requests.Request('GET', url).prepare(), raw)
+
 if API_KEY:
     rl_auth = RocketLeagueAPI(API_KEY, debug_response=True)
 
@@ -168,6 +193,283 @@ class TestUnauthenticatedCalls(object):
         assert response == {"detail": "Invalid token header. No credentials provided."}
 
 
+class TestCircuitBreaker(object):
+
+    def test_opens_after_threshold(self):
+        breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=30)
+        breaker.record_failure()
+        assert breaker.allow_request()
+
+        breaker.record_failure()
+        assert not breaker.allow_request()
+
+    def test_probe_after_recovery_timeout(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+        assert not breaker.allow_request()
+
+        # A single probe is let through.
+        breaker.opened_at -= 30
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        breaker.record_success()
+        assert breaker.allow_request()
+
+    def test_lost_probe_is_replaced(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+        breaker.record_failure()
+        breaker.opened_at -= 30
+
+        assert breaker.allow_request()
+        assert not breaker.allow_request()
+
+        # The probe never reported back.
+        breaker.probe_started_at -= 30
+        assert breaker.allow_request()
+        assert breaker.state == 'half-open'
+
+    def test_client_releases_interrupted_probe(self, monkeypatch):
+        def interrupt(*args, **kwargs):
+            raise KeyboardInterrupt()
+
+        monkeypatch.setattr(requests, 'get', interrupt)
+        rl = RocketLeagueAPI('', failure_threshold=1, recovery_timeout=0)
+        breaker = rl.circuit_breaker(('GET', 'regions'))
+        breaker.record_failure()
+
+        with pytest.raises(KeyboardInterrupt):
+            rl.get_regions()
+
+        assert breaker.state == 'open'
+        assert breaker.allow_request()
+
+    def test_released_probe(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow_request()
+        breaker.release_probe()
+        assert breaker.allow_request()
+
+    def test_failed_probe_reopens(self):
+        breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+        breaker.record_failure()
+
+        assert breaker.allow_request()
+        breaker.record_failure()
+        assert breaker.state == 'open'
+
+    def test_latency_percentile(self):
+        tracker = LatencyTracker(min_samples=10)
+        assert tracker.percentile(95) is None
+
+        for latency in range(100):
+            tracker.record(latency)
+
+        assert tracker.percentile(95) == 94
+
+    def test_client_fails_fast(self, monkeypatch):
+        calls = []
+
+        def timeout(*args, **kwargs):
+            calls.append(kwargs['timeout'])
+            raise requests.exceptions.Timeout()
+
+        monkeypatch.setattr(requests, 'get', timeout)
+        rl = RocketLeagueAPI('', connect_timeout=1, read_timeout=2, failure_threshold=2)
+
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.Timeout):
+                rl.get_player_titles('steam', 1)
+
+        # The breaker is shared by every request to the same endpoint template.
+        with pytest.raises(CircuitOpenError):
+            rl.get_player_titles('steam', 2)
+
+        assert calls == [(1, 2), (1, 2)]
+
+    def test_programmer_errors_dont_trip_circuit(self):
+        rl = RocketLeagueAPI(None, failure_threshold=1)
+
+        with pytest.raises(TypeError):
+            rl.get_regions()
+
+        assert rl.circuit_breaker(('GET', 'regions')).failures == 0
+
+    def test_client_records_failed_latency(self, monkeypatch):
+        def timeout(*args, **kwargs):
+            raise requests.exceptions.Timeout()
+
+        monkeypatch.setattr(requests, 'get', timeout)
+        rl = RocketLeagueAPI('')
+
+        with pytest.raises(requests.exceptions.Timeout):
+            rl.get_regions()
+
+        tracker = rl.latency_tracker(('GET', 'regions'))
+        tracker.min_samples = 1
+        assert tracker.percentile(95) is not None
+
+    def hedged_client(self, monkeypatch):
+        calls = []
+
+        # The first request is slow, any duplicate returns straight away. The
+        # body is the attempt number.
+        def get(url, **kwargs):
+            calls.append(None)
+            attempt = len(calls)
+
+            if attempt == 1:
+                time.sleep(1)
+
+            return build_response(url, str(attempt).encode('utf-8'))
+
+        monkeypatch.setattr(requests, 'get', get)
+        rl = RocketLeagueAPI('', hedge_requests=True, debug_response=True)
+
+        tracker = rl.latency_tracker(('GET', 'regions'))
+        for _ in range(tracker.min_samples):
+            tracker.record(0.01)
+
+        return rl
+
+    def test_client_hedges_slow_get(self, monkeypatch):
+        rl = self.hedged_client(monkeypatch)
+        assert rl.get_regions().json() == 2
+
+    def test_client_doesnt_hedge_failing_endpoint(self, monkeypatch):
+        rl = self.hedged_client(monkeypatch)
+        rl.circuit_breaker(('GET', 'regions')).record_failure()
+
+        assert rl.get_regions().json() == 1
+
+    def test_client_caps_hedge_ratio(self, monkeypatch):
+        rl = self.hedged_client(monkeypatch)
+        rl.latency_tracker(('GET', 'regions')).record_hedge(True)
+
+        assert rl.get_regions().json() == 1
+
+
+class ChunkedGzipHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    body = json.dumps([{'region': 'EU', 'platforms': 'Steam,PS4,XboxOne,Switch'}] * 50).encode('utf-8')
+
+    def do_GET(self):
+        self.server.accept_encoding = self.headers.get('Accept-Encoding')
+
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        compressed = compressor.compress(self.body) + compressor.flush()
+        self.server.compressed = compressed
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        for index in range(0, len(compressed), 16):
+            chunk = compressed[index:index + 16]
+            self.wfile.write('{:x}\r\n'.format(len(chunk)).encode('ascii') + chunk + b'\r\n')
+
+        self.wfile.write(b'0\r\n\r\n')
+
+    def log_message(self, *args):
+        pass
+
+
+class TestTransferAccounting(object):
+
+    def test_chunked_gzip_response(self, monkeypatch):
+        server = HTTPServer(('127.0.0.1', 0), ChunkedGzipHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        monkeypatch.setattr(client, 'API_BASE_URL', 'http://127.0.0.1:{}/'.format(server.server_port))
+        rl = RocketLeagueAPI('', debug_response=True)
+
+        try:
+            response = rl.get_regions()
+            rl.get_regions()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        assert server.accept_encoding.startswith('gzip, deflate')
+        assert response.json()[0]['region'] == 'EU'
+        assert response.compressed_bytes == len(server.compressed)
+        assert response.decompressed_bytes == len(ChunkedGzipHandler.body)
+
+        assert rl.transfer_stats[('GET', 'regions')] == {
+            'requests': 2,
+            'sent_bytes': 0,
+            'compressed_bytes': 2 * len(server.compressed),
+            'decompressed_bytes': 2 * len(ChunkedGzipHandler.body),
+        }
+        assert rl.transfer_totals == rl.transfer_stats[('GET', 'regions')]
+
+    def test_deflate_post(self, monkeypatch):
+        body = json.dumps([{'user_id': 1, 'player_skills': []}]).encode('utf-8')
+        compressed = zlib.compress(body)
+
+        def post(url, **kwargs):
+            return build_response(url, compressed, {'Content-Encoding': 'deflate'})
+
+        monkeypatch.setattr(requests, 'post', post)
+        rl = RocketLeagueAPI('')
+
+        assert rl.get_player_skills('steam', [1, 2]) == [{'user_id': 1, 'player_skills': []}]
+        assert rl.transfer_totals == {
+            'requests': 1,
+            'sent_bytes': len(json.dumps({'player_ids': [1, 2]})),
+            'compressed_bytes': len(compressed),
+            'decompressed_bytes': len(body),
+        }
+
+    def test_stacked_encodings(self, monkeypatch):
+        body = b'[1, 2, 3]'
+
+        compressor = zlib.compressobj(9, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        gzipped = compressor.compress(zlib.compress(body)) + compressor.flush()
+
+        def get(url, **kwargs):
+            return build_response(url, gzipped, {'Content-Encoding': 'deflate, gzip, identity'})
+
+        monkeypatch.setattr(requests, 'get', get)
+        rl = RocketLeagueAPI('')
+
+        assert rl.get_regions() == [1, 2, 3]
+
+    def test_unknown_encoding(self, monkeypatch):
+        responses = []
+
+        def get(url, **kwargs):
+            responses.append(build_response(url, b'[]', {'Content-Encoding': 'gzip, compress'}))
+            return responses[-1]
+
+        monkeypatch.setattr(requests, 'get', get)
+        rl = RocketLeagueAPI('', failure_threshold=1)
+
+        with pytest.raises(requests.exceptions.ContentDecodingError):
+            rl.get_regions()
+
+        # The connection is released, and the circuit isn't tripped.
+        assert responses[0].raw.closed
+        assert rl.circuit_breaker(('GET', 'regions')).failures == 0
+
+    def test_corrupt_body(self, monkeypatch):
+        def get(url, **kwargs):
+            return build_response(url, b'not gzip', {'Content-Encoding': 'gzip'})
+
+        monkeypatch.setattr(requests, 'get', get)
+        rl = RocketLeagueAPI('')
+
+        with pytest.raises(requests.exceptions.ContentDecodingError):
+            rl.get_regions()
+
+
 # Test accounts:
 # 76561198328949073: Doesn't own the game, non-ASCII chars in name.
 # 76561198022035654: Player that's never logged in.
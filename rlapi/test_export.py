@@ -0,0 +1,133 @@
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from rlapi.export import PlayerSkillsWriter, PlayerStatsWriter, iter_row_groups, read_table  # noqa: E402
+
+SKILLS_RESPONSE = [
+    {
+        'user_name': '[SA] Snaski',
+        'user_id': 76561198024807207,
+        'player_skills': [
+            {'playlist': 10, 'tier': 0, 'skill': 164, 'tier_max': 0, 'matches_played': 1, 'division': 0},
+            {'playlist': 11, 'tier': 13, 'skill': 1294, 'tier_max': 13, 'matches_played': 106, 'division': 2},
+        ]
+    },
+    {
+        'user_name': 'RocketLeagueReplays.com',
+        'user_id': 76561198022035654,
+        'player_skills': [],
+    },
+]
+
+STATS_RESPONSE = {
+    76561198024807207: {
+        'saves': 14099,
+        'wins': 7803,
+        'mvps': 3757,
+        'shots': 42193,
+        'goals': 18017,
+        'assists': 9284
+    },
+    76561198008869772: {
+        'wins': 10,
+    },
+}
+
+
+class TestExport(object):
+
+    def test_player_skills_round_trip(self, tmpdir):
+        path = str(tmpdir.join('skills.parquet'))
+
+        with PlayerSkillsWriter(path) as writer:
+            writer.write_response('steam', SKILLS_RESPONSE)
+
+        assert writer.rows_written == 2
+
+        table = read_table(path)
+        assert table.column('skill').to_pylist() == [164, 1294]
+        assert table.column('user_id').to_pylist() == ['76561198024807207'] * 2
+        assert table.column('platform').to_pylist() == ['steam'] * 2
+
+    def test_player_stats_column_projection(self, tmpdir):
+        path = str(tmpdir.join('stats.parquet'))
+
+        with PlayerStatsWriter(path) as writer:
+            writer.write_response('steam', STATS_RESPONSE)
+
+        table = read_table(path, columns=['player_id', 'goals'])
+        assert table.column_names == ['player_id', 'goals']
+
+        rows = dict(zip(table.column('player_id').to_pylist(), table.column('goals').to_pylist()))
+        assert rows == {'76561198024807207': 18017, '76561198008869772': None}
+
+    def test_row_groups(self, tmpdir):
+        path = str(tmpdir.join('skills.parquet'))
+
+        with PlayerSkillsWriter(path, row_group_size=1) as writer:
+            writer.write_response('steam', SKILLS_RESPONSE)
+            writer.write_response('ps4', SKILLS_RESPONSE)
+
+        row_groups = list(iter_row_groups(path, columns=['platform']))
+        assert len(row_groups) == 4
+        assert [group.column('platform').to_pylist() for group in row_groups] == [
+            ['steam'], ['steam'], ['ps4'], ['ps4'],
+        ]
+
+    def test_string_user_id(self, tmpdir):
+        path = str(tmpdir.join('skills.parquet'))
+
+        with PlayerSkillsWriter(path) as writer:
+            writer.write_response('steam', [{
+                'user_id': '76561198024807207',
+                'player_skills': [{'playlist': 10, 'tier': '200', 'skill': 164}],
+            }])
+
+        table = read_table(path, columns=['user_id', 'tier'])
+        assert table.column('user_id').to_pylist() == ['76561198024807207']
+        assert table.column('tier').to_pylist() == [200]
+
+    def test_error_responses_are_skipped(self, tmpdir):
+        path = str(tmpdir.join('skills.parquet'))
+
+        with PlayerSkillsWriter(path) as writer:
+            assert writer.write_response('steam', '<h1>Server Error (500)</h1>') == 0
+            assert writer.write_response('steam', {'detail': 'Player ID/name not found'}) == 0
+            assert writer.write_response('steam', SKILLS_RESPONSE) == 2
+
+        assert read_table(path).num_rows == 2
+
+        path = str(tmpdir.join('stats.parquet'))
+
+        with PlayerStatsWriter(path) as writer:
+            assert writer.write_response('steam', '<h1>Server Error (500)</h1>') == 0
+
+        assert read_table(path).num_rows == 0
+
+    def test_out_of_range_value(self, tmpdir):
+        path = str(tmpdir.join('stats.parquet'))
+
+        with PlayerStatsWriter(path) as writer:
+            with pytest.raises(ValueError):
+                writer.write_response('steam', {1: {'goals': 2 ** 70}})
+
+            writer.write_response('steam', STATS_RESPONSE)
+
+        table = read_table(path, columns=['player_id'])
+        assert sorted(table.column('player_id').to_pylist()) == ['76561198008869772', '76561198024807207']
+
+    def test_close_writes_footer_after_failed_flush(self, tmpdir):
+        path = str(tmpdir.join('stats.parquet'))
+        writer = PlayerStatsWriter(path)
+
+        # Bypass validation to force the flush to fail.
+        for name in writer.schema.names:
+            writer._columns[name].append(2 ** 70 if name == 'goals' else None)
+
+        writer._buffered += 1
+
+        with pytest.raises(Exception):
+            writer.close()
+
+        assert read_table(path).num_rows == 0
@@ -0,0 +1,101 @@
+import pytest
+from rlapi.leaderboard import EVENT_CHANGED, EVENT_ENTERED, EVENT_LEFT, EVENT_MOVED, LeaderboardDiff
+
+
+def skill_row(name, skill):
+    return {'user_name': name, 'skill': skill, 'tier': 15}
+
+
+class TestLeaderboardDiff(object):
+
+    def test_first_snapshot_enters_everyone(self):
+        diff = LeaderboardDiff()
+        events = diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500), skill_row('b', 1400)])
+
+        assert [(event.event, event.player, event.rank) for event in events] == [
+            (EVENT_ENTERED, 'a', 1),
+            (EVENT_ENTERED, 'b', 2),
+        ]
+
+    def test_only_changed_rows(self):
+        diff = LeaderboardDiff()
+        diff.update_skill_leaderboard('ps4', 10, [
+            skill_row('a', 1500),
+            skill_row('b', 1400),
+            skill_row('c', 1300),
+            skill_row('d', 1200),
+        ])
+
+        events = diff.update_skill_leaderboard('ps4', 10, [
+            skill_row('b', 1510),
+            skill_row('a', 1500),
+            skill_row('c', 1305),
+            skill_row('e', 1250),
+        ])
+
+        assert [
+            (event.event, event.player, event.rank, event.previous_rank, event.value, event.previous_value)
+            for event in events
+        ] == [
+            (EVENT_MOVED, 'b', 1, 2, 1510, 1400),
+            (EVENT_MOVED, 'a', 2, 1, 1500, 1500),
+            (EVENT_CHANGED, 'c', 3, 3, 1305, 1300),
+            (EVENT_ENTERED, 'e', 4, None, 1250, None),
+            (EVENT_LEFT, 'd', None, 4, None, 1200),
+        ]
+
+        # Nothing has changed since the last snapshot.
+        assert diff.update_skill_leaderboard('ps4', 10, [
+            skill_row('b', 1510),
+            skill_row('a', 1500),
+            skill_row('c', 1305),
+            skill_row('e', 1250),
+        ]) == []
+
+    def test_snapshots_are_separate(self):
+        diff = LeaderboardDiff()
+        diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500)])
+
+        assert diff.update_skill_leaderboard('ps4', 11, [skill_row('a', 1500)])[0].event == EVENT_ENTERED
+        assert diff.update_skill_leaderboard('steam', 10, [skill_row('a', 1500)])[0].event == EVENT_ENTERED
+
+    def test_unfiltered_stats_leaderboard(self):
+        diff = LeaderboardDiff()
+        diff.update_stats_leaderboard('steam', [
+            {'stat_type': 'assists', 'stats': [{'assists': 2950, 'username': 'x'}]},
+            {'stat_type': 'goals', 'stats': [{'goals': 17789, 'username': 'x'}]},
+        ])
+
+        events = diff.update_stats_leaderboard('steam', [{'goals': 17790, 'username': 'x'}], 'goals')
+        assert [(event.event, event.value, event.previous_value) for event in events] == [
+            (EVENT_CHANGED, 17790, 17789),
+        ]
+
+    def test_error_responses_are_rejected(self):
+        diff = LeaderboardDiff()
+        diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500)])
+
+        with pytest.raises(ValueError):
+            diff.update_skill_leaderboard('ps4', 10, '<h1>Server Error (500)</h1>')
+
+        with pytest.raises(ValueError):
+            diff.update_stats_leaderboard('ps4', {'detail': 'Invalid token.'}, 'goals')
+
+        # The previous snapshot is untouched.
+        assert diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500)]) == []
+
+    def test_empty_response_keeps_snapshot(self):
+        diff = LeaderboardDiff()
+        diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500)])
+
+        assert diff.update_skill_leaderboard('ps4', 10, []) == []
+        assert diff.update_skill_leaderboard('ps4', 10, [skill_row('a', 1500)]) == []
+
+        events = diff.update_skill_leaderboard('ps4', 10, [], allow_empty=True)
+        assert [(event.event, event.player) for event in events] == [(EVENT_LEFT, 'a')]
+
+    def test_player_ids_compared_as_strings(self):
+        diff = LeaderboardDiff()
+        diff.update_skill_leaderboard('steam', 10, [{'user_id': 1, 'skill': 1500}])
+
+        assert diff.update_skill_leaderboard('steam', 10, [{'user_id': '1', 'skill': 1500}]) == []
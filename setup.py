@@ -16,8 +16,14 @@ setup(
     description='Client library for the official Rocket League API.',
     long_description=open('README.md').read(),
     long_description_content_type='text/markdown',
-    install_requires=['requests'],
+    install_requires=['requests', 'urllib3'],
     extras_require={
+        'brotli': [
+            'brotli',
+        ],
+        'export': [
+            'pyarrow',
+        ],
         'testing': [
             'coverage',
             'pytest',